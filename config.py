@@ -11,6 +11,9 @@ AUTO_EXTRACT_DIR = "storage/books" # Automatically extract the downloaded torren
 AUTO_DEL_BATCH = True # Automatically delete batch archive files once automatically extracted
 AUTO_SPEND_POINTS = False # Automatically spend remaining bonus points on upload
 
+# Caching
+USER_CACHE_TTL = 60 # Time in seconds fetched user details are reused between runs (0 to disable)
+
 # Torrent search criteria
 # More information: https://www.myanonamouse.net/api/endpoint.php/1/tor/js/loadSearchJSONbasic.php
 SKIP = ['sSat', 'unsat'] # sSat, unsat, inactHnr, inactUnsat, upInact, inactSat, seedUnsat, seedHnr, leeching, upAct
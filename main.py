@@ -1,20 +1,72 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import config
-import json
-import copy
+import orjson
 import os
 import math
+import heapq
+import hashlib
+import re
 import time
 import zipfile
+import pickle
+import shutil
+import tempfile
+import threading
 import argparse
+from operator import itemgetter
+from rapidfuzz import fuzz, process, utils
+from concurrent.futures import ThreadPoolExecutor
+from mam_api import USER_CACHE_FILE, clear_user_cache
 
-session = requests.Session()
 headers = {}
 freshLoad = True
 base_url = "https://www.myanonamouse.net"
 data_dir = "storage"
 storage_path = "storage/data.json"
+snatch_cache_path = "storage/snatch_cache.pkl"
+user_cache_path = os.path.join(data_dir, USER_CACHE_FILE)
 data = {}
+snatchCache = {}
+snatchCacheLock = threading.Lock()
+
+# Number of snatch list pages requested at once, shared by every list being
+# refreshed so the total stays within the session's connection pool
+SNATCH_WINDOW = 8
+snatchExecutor = ThreadPoolExecutor(max_workers=SNATCH_WINDOW)
+
+# Batch zip downloads, at most BATCH_WORKERS requests per BATCH_RATE_PERIOD seconds
+BATCH_WORKERS = 3
+BATCH_RATE_PERIOD = 15
+batchLimiter = threading.Semaphore(BATCH_WORKERS)
+# ZipFile.extract creates member dirs with an unguarded exists/makedirs, so batches extract one at a time
+extractLock = threading.Lock()
+
+# Pulls the id out of a snatch list row
+_getId = itemgetter('id')
+
+# Bytes to GiB factor for displaying torrent sizes
+_GB_INV = 1.0 / (1 << 30)
+
+# Answer to the search result prompt: a number, Q to cancel, or blank to ask again
+_CHOICE_RE = re.compile(r'^\s*([qQ]|\d+)?\s*$')
+
+# Build a session which keeps connections to the site alive between requests
+def createSession() -> requests.Session:
+    session = requests.Session()
+    retries = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=16, max_retries=retries))
+    session.headers.update({"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate"})
+    session.cookies.set("mam_id", config.MAM_ID, domain=".myanonamouse.net")
+    return session
+
+session = createSession()
 
 # Create data dir
 if not os.path.exists(data_dir):
@@ -23,17 +75,71 @@ if not os.path.exists(data_dir):
 # Load previously saved data
 if os.path.exists(storage_path):
     with open(storage_path, 'rb') as f:
-        data = json.loads(f.read())
+        data = orjson.loads(f.read())
         freshLoad = False
 
+# Load previously fetched snatch list pages
+if os.path.exists(snatch_cache_path):
+    with open(snatch_cache_path, 'rb') as f:
+        snatchCache = pickle.load(f)
+
 # Save data to prevent constant unneeded requests
 def saveDataFile() -> bool:
     data['lastSaved'] = time.time()
-    with open(storage_path, 'w') as f:
-        json.dump(data, f)
+    # Write to a temp file first so a crash mid-write can't corrupt the saved data
+    tmp_path = storage_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(data))
+    os.replace(tmp_path, storage_path)
+
+# Save snatch list pages, keyed on (uid, type), so later runs only fetch new pages
+def saveSnatchCache():
+    tmp_path = snatch_cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snatchCache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snatch_cache_path)
+
+# Decode a JSON response body with orjson, skipping requests' text decode
+def parseResponse(response: requests.Response):
+    return orjson.loads(response.content)
+
+# Key user details on the session id so switching accounts doesn't reuse them
+def _userCacheKey() -> str:
+    return hashlib.sha256(config.MAM_ID.encode()).hexdigest()
+
+# Load user details saved by a run less than USER_CACHE_TTL seconds ago
+def _loadUserCache() -> dict:
+    if not config.USER_CACHE_TTL or not os.path.exists(user_cache_path):
+        return None
+    if time.time() - os.path.getmtime(user_cache_path) >= config.USER_CACHE_TTL:
+        return None
+
+    with open(user_cache_path, 'rb') as f:
+        try:
+            cached = orjson.loads(f.read())
+        except orjson.JSONDecodeError:
+            return None
+
+    if cached.get('key') != _userCacheKey():
+        return None
+    return cached.get('user')
+
+def _saveUserCache(user: dict):
+    if not config.USER_CACHE_TTL:
+        return
+    with open(user_cache_path, 'wb') as f:
+        f.write(orjson.dumps({"key": _userCacheKey(), "user": user}))
+
+# Downloads change the unsatisfied count, so the next run has to refetch
+def _clearUserCache():
+    clear_user_cache(user_cache_path)
 
 def getUserDetails() -> dict:
-    headers["cookie"] = f"mam_id={config.MAM_ID}"
+    # Skip the request if a recent run already fetched them
+    user = _loadUserCache()
+    if user:
+        return user
+
     response = session.get(
             f"{base_url}/jsonLoad.php?snatch_summary", 
             headers=headers
@@ -43,61 +149,102 @@ def getUserDetails() -> dict:
     if response.status_code != 200:
         return None
 
-    return response.json()
+    user = parseResponse(response)
+    _saveUserCache(user)
+    return user
+
+def _fetchSnatchPage(uid, type: str, iteration: int) -> list:
+    response = session.get(
+        f"{base_url}/json/loadUserDetailsTorrents.php?uid={uid}&type={type}&iteration={str(iteration)}",
+        headers=headers
+    )
+
+    cur = parseResponse(response)
+
+    # Filter ids from results
+    return list(map(_getId, cur['rows']))
+
+def _cachedSnatchPages(user: dict, type: str) -> list:
+    # The last page may have been partial when cached, always fetch it again
+    pages = snatchCache.get((user['uid'], type), [])[:-1]
+    if not pages:
+        return []
+
+    # More cached ids than the server reports means the list shrank
+    if sum(len(page) for page in pages) > user[type]['count']:
+        return []
+
+    # Boundary moved (e.g. new items pushed onto earlier pages), start over
+    if snatchExecutor.submit(_fetchSnatchPage, user['uid'], type, len(pages) - 1).result() != pages[-1]:
+        return []
+
+    return pages
 
 def getSnatchListIds(user: dict, type: str = 'sSat') -> list:
-    results = []
-    iteration = 0
+    # Resume after pages already fetched on a previous run
+    pages = _cachedSnatchPages(user, type)
+    iteration = len(pages)
     keepGoing = True
-    previous = None
-    
-    # Increment through snatched until no results
+    previous = pages[-1] if pages else None
+
+    # Request a window of pages at once so the round-trips overlap, the
+    # shared pool caps how many requests hit the site concurrently
     while keepGoing:
-        response = session.get(
-            f"{base_url}/json/loadUserDetailsTorrents.php?uid={user['uid']}&type={type}&iteration={str(iteration)}",
-            headers=headers
+        batch = snatchExecutor.map(
+            lambda i: _fetchSnatchPage(user['uid'], type, i),
+            range(iteration, iteration + SNATCH_WINDOW)
         )
-        unix = time.time()
 
-        cur = response.json()
-        # No results remaining, or unsat (returns all at once) - not sure if this is the case for users with 200 limit?
-        if not cur['rows']:
-            keepGoing = False
-            continue
-        
-        # Filter ids from results
-        ids = []
-        for row in cur['rows']:
-            ids.append(row['id'])
+        # Fold pages in order until no results remain, or unsat (returns all at once) - not sure if this is the case for users with 200 limit?
+        for ids in batch:
+            # Ensure its not empty or the same as last result
+            if not ids or ids == previous:
+                keepGoing = False
+                break
 
-        # Ensure its not the same as last result
-        if ids == previous:
-            keepGoing = False
-            continue
+            previous = ids
+            pages.append(ids)
+            iteration += 1
 
-        previous = ids
-        results.extend(ids)
-        iteration += 1
+    # Lists can be refreshed in parallel, keep the cache consistent while pickling
+    with snatchCacheLock:
+        snatchCache[(user['uid'], type)] = pages
+        saveSnatchCache()
 
-    return results
+    return [id for page in pages for id in page]
+
+# Copy config.SEARCH one level deep, only the top level and 'tor' get modified
+def _cloneSearch() -> dict:
+    payload = dict(config.SEARCH)
+    payload['tor'] = dict(config.SEARCH.get('tor', {}))
+    return payload
 
-def getTorrents(snatched: list = [], amount: int = 100):
+# Post a search payload encoded with orjson instead of requests' json= encoder
+def postSearch(payload: dict) -> dict:
+    response = session.post(
+        f"{base_url}/tor/js/loadSearchJSONbasic.php",
+        headers={**headers, "Content-Type": "application/json"},
+        data=orjson.dumps(payload)
+    )
+
+    return parseResponse(response)
+
+def getTorrents(snatched: set = None, amount: int = 100):
+    snatched = snatched or set()
     keepGoing = True
     iteration = 0 
     results = []
+    results_set = set()
+
+    # Work on a copy so config.SEARCH is left untouched, only the page offset changes per loop
+    payload = _cloneSearch()
+    payload['perpage'] = 100
     
     while keepGoing:
-        config.SEARCH['perpage'] = 100
-        config.SEARCH['tor']['startNumber'] = iteration
+        payload['tor']['startNumber'] = iteration
 
         # Use search endpoint
-        response = session.post(
-            f"{base_url}/tor/js/loadSearchJSONbasic.php", 
-            headers=headers,
-            json=config.SEARCH
-        )
-
-        cur = response.json()
+        cur = postSearch(payload)
 
         # Stop loop if error occurs
         if 'error' in cur:
@@ -112,12 +259,13 @@ def getTorrents(snatched: list = [], amount: int = 100):
             id = str(torrent['id'])
 
             # Check if snatched already
-            if id in snatched or id in results:
+            if id in snatched or id in results_set:
                 continue
 
             # Add if desired count hasn't been reached
             if len(results) < amount:
                 results.append(id)
+                results_set.add(id)
 
         iteration += page_amt
 
@@ -127,13 +275,14 @@ def getTorrents(snatched: list = [], amount: int = 100):
 
     return results
 
-def fetchTorrents(snatched: list = [], max_results: int = 500, title: str = None, author: str = None):
+def fetchTorrents(snatched: set = None, max_results: int = 500, title: str = None, author: str = None):
     """Fetch full torrent objects from the search endpoint (not only ids).
 
     If title/author are provided, they will be injected into a copy of
     `config.SEARCH` (as tor.text and tor.srchIn) so the API performs a text
     search rather than returning nothing.
     """
+    snatched = snatched or set()
     keepGoing = True
     iteration = 0
     results = []
@@ -167,21 +316,15 @@ def fetchTorrents(snatched: list = [], max_results: int = 500, title: str = None
         }
     else:
         # Use config settings for non-text searches
-        base_payload = copy.deepcopy(config.SEARCH)
+        base_payload = _cloneSearch()
+
+    # Respect perpage and pagination on the working payload copy
+    base_payload['perpage'] = 100
 
     while keepGoing:
-        # Respect perpage and pagination on the working payload copy
-        base_payload['perpage'] = 100
-        base_payload.setdefault('tor', {})
         base_payload['tor']['startNumber'] = iteration
 
-        response = session.post(
-            f"{base_url}/tor/js/loadSearchJSONbasic.php",
-            headers=headers,
-            json=base_payload
-        )
-
-        cur = response.json()
+        cur = postSearch(base_payload)
 
         # Stop loop if error occurs
         if 'error' in cur:
@@ -206,64 +349,109 @@ def fetchTorrents(snatched: list = [], max_results: int = 500, title: str = None
     return results
 
 
-def fuzzy_score(query: str, target) -> float:
-    """Simple fuzzy scoring using SequenceMatcher; returns 0..1."""
-    from difflib import SequenceMatcher
-    if not query or not target:
-        return 0.0
-    # Convert target to string in case it's a number
-    q = str(query).lower().strip()
-    t = str(target).lower().strip()
-    # exact substring gives boost
-    if q in t:
-        return 1.0
-    return SequenceMatcher(None, q, t).ratio()
+def _score_all(query: str, choices: list) -> list:
+    """Score every choice against query in a single RapidFuzz call; returns 0..1 per choice.
+
+    Choices must already be normalised with utils.default_process.
+    """
+    scores = [0.0] * len(choices)
+    if not query:
+        return scores
+    matches = process.extract(
+        utils.default_process(query), choices,
+        scorer=fuzz.WRatio,
+        processor=None,
+        limit=None
+    )
+    for _, score, idx in matches:
+        scores[idx] = score / 100.0
+    return scores
+
+
+def _token_gate(title: str, author: str, haystacks: list) -> list:
+    """Indexes of haystacks containing enough query words to be worth fuzzy scoring."""
+    tokens = set()
+    for query in (title, author):
+        if query:
+            tokens.update(utils.default_process(query).split())
+    # Multi-word queries need two words to match, single words just one
+    need = min(2, len(tokens))
+    return [i for i, h in enumerate(haystacks) if sum(tok in h for tok in tokens) >= need]
+
+
+def _author_list(t: dict) -> list:
+    """Author names from a torrent's author_info, parsed once and cached on the dict."""
+    names = t.get('_author_cached')
+    if names is None:
+        # MAM API has 'author_info' as a JSON string like {"8234": "Kerrelyn Sparks"}
+        names = []
+        author_info_str = t.get('author_info', '')
+        if author_info_str:
+            try:
+                names = [str(v) for v in orjson.loads(author_info_str).values()]
+            except:
+                pass
+        t['_author_cached'] = names
+    return names
+
+
+def _size_str(t: dict) -> str:
+    """Human readable torrent size, formatted once and cached on the dict."""
+    size_str = t.get('_size_cached')
+    if size_str is None:
+        # Format size nicely (it comes as bytes string)
+        size_bytes = t.get('size', '')
+        size_str = ''
+        if size_bytes:
+            try:
+                size_str = f"{int(size_bytes) * _GB_INV:.2f} GB"
+            except (TypeError, ValueError):
+                size_str = size_bytes
+        t['_size_cached'] = size_str
+    return size_str
 
 
-def choose_from_search(title: str = None, author: str = None, snatched: list = None, max_fetch: int = 500) -> str:
+def choose_from_search(title: str = None, author: str = None, snatched: set = None, max_fetch: int = 500) -> str:
     """Search for torrents matching title/author and prompt the user to pick one.
 
     Returns the chosen torrent id as a string, or None if cancelled.
     """
-    snatched = snatched or []
+    snatched = snatched or set()
     print(f"Searching for title={title!r} author={author!r} (fetching up to {max_fetch} results)")
     torrents = fetchTorrents(snatched, max_fetch, title=title, author=author)
     if not torrents:
         print("No search results returned from server.")
         return None
 
-    scored = []
+    t_titles = []
+    t_authors = []
     for t in torrents:
-        # MAM API uses 'title' for the torrent title
-        t_title = t.get('title', '')
-        
-        # MAM API has 'author_info' as a JSON string like {"8234": "Kerrelyn Sparks"}
-        # Parse it and concatenate author names
-        t_author = ''
-        author_info_str = t.get('author_info', '')
-        if author_info_str:
-            try:
-                author_dict = json.loads(author_info_str)
-                t_author = ' '.join(author_dict.values())
-            except:
-                pass
+        # MAM API uses 'title' for the torrent title, normalise once for matching
+        t_titles.append(utils.default_process(str(t.get('title') or '')))
         
-        # Also check owner_name as fallback
-        if not t_author:
-            t_author = t.get('owner_name', '')
-
-        title_score = fuzzy_score(title, t_title) if title else 0
-        author_score = fuzzy_score(author, t_author) if author else 0
-
-        if title and author:
-            score = title_score * 0.7 + author_score * 0.3
-        else:
-            score = max(title_score, author_score)
-
-        scored.append((score, t))
+        # Concatenate author names, also check owner_name as fallback
+        t_author = ' '.join(_author_list(t)) or t.get('owner_name') or ''
+        t_authors.append(utils.default_process(str(t_author)))
+
+    # Skip candidates sharing no words with the query, unless that leaves too few to pick from
+    haystacks = [f"{t_title} {t_author}" for t_title, t_author in zip(t_titles, t_authors)]
+    keep = _token_gate(title, author, haystacks)
+    if len(keep) >= 10:
+        torrents = [torrents[i] for i in keep]
+        t_titles = [t_titles[i] for i in keep]
+        t_authors = [t_authors[i] for i in keep]
+
+    # Score each field across all candidates at once, then combine
+    title_scores = _score_all(title, t_titles)
+    author_scores = _score_all(author, t_authors)
+
+    if title and author:
+        combined = [ts * 0.7 + au * 0.3 for ts, au in zip(title_scores, author_scores)]
+    else:
+        combined = title_scores if title else author_scores
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = [item for item in scored if item[0] > 0][:10]
+    # Only the best 10 are shown, no need to sort every candidate
+    top = heapq.nlargest(10, ((score, t) for score, t in zip(combined, torrents) if score > 0), key=lambda x: x[0])
 
     if not top:
         print("No close matches found.")
@@ -274,69 +462,79 @@ def choose_from_search(title: str = None, author: str = None, snatched: list = N
         tid = t.get('id')
         title_str = t.get('title', '<no title>')
         
-        # Extract author names from author_info JSON
-        author_names = ''
-        author_info_str = t.get('author_info', '')
-        if author_info_str:
-            try:
-                author_dict = json.loads(author_info_str)
-                author_names = ', '.join(author_dict.values())
-            except:
-                pass
-        
-        # Format size nicely (it comes as bytes string)
-        size_bytes = t.get('size', '')
-        size_str = ''
-        if size_bytes:
-            try:
-                size_gb = int(size_bytes) / (1024**3)
-                size_str = f"{size_gb:.2f} GB"
-            except:
-                size_str = size_bytes
+        author_names = ', '.join(_author_list(t))
+        size_str = _size_str(t)
         
         author_part = f" by {author_names}" if author_names else ""
         size_part = f" ({size_str})" if size_str else ""
         print(f"{idx}. [{tid}] {title_str}{author_part}{size_part} [score: {score:.2f}]")
 
     while True:
-        choice = input("Enter number to download, or Q to cancel: ").strip()
-        if not choice:
-            continue
-        if choice.lower() == 'q':
-            return None
-        if choice.isdigit():
+        m = _CHOICE_RE.match(input("Enter number to download, or Q to cancel: "))
+        if m:
+            choice = m.group(1)
+            if not choice:
+                continue
+            if choice in 'qQ':
+                return None
             n = int(choice)
             if 1 <= n <= len(top):
                 selected = top[n-1][1]
                 return str(selected.get('id'))
         print("Invalid choice, try again.")
 
+def _acquireBatchSlot():
+    batchLimiter.acquire()
+    # Hand the slot back once the rate period has passed
+    timer = threading.Timer(BATCH_RATE_PERIOD, batchLimiter.release)
+    timer.daemon = True
+    timer.start()
+
+def _downloadOneBatch(n: int, batch: list):
+    tids = '&'.join([f'tids[]={id}' for id in batch])
+
+    _acquireBatchSlot()
+    response = session.get(
+        f"{base_url}/DownloadZips.php?type=batch&{tids}", 
+        headers={**headers, "Content-Type": "application/x-zip"},
+        timeout=30,
+        stream=True
+    )
+
+    # Stream result to zip file, a temp file is enough if it gets deleted after extraction
+    if config.AUTO_EXTRACT_DIR and config.AUTO_DEL_BATCH:
+        f = tempfile.NamedTemporaryFile(prefix="batch_", suffix=".zip", delete=False)
+    else:
+        f = open(os.path.join(data_dir, f"batch_{time.time()}_{n}.zip"), 'wb')
+    with response, f:
+        response.raw.decode_content = True
+        shutil.copyfileobj(response.raw, f, length=1 << 20)
+    path = f.name
+
+    # Extract to specified dir one member at a time
+    if config.AUTO_EXTRACT_DIR:
+        print(f"Extracting {path} to {config.AUTO_EXTRACT_DIR}")
+        with extractLock, zipfile.ZipFile(path, 'r') as f:
+            for member in f.infolist():
+                f.extract(member, config.AUTO_EXTRACT_DIR)
+        if config.AUTO_DEL_BATCH:
+            os.remove(path)
+
 def downloadBatch(ids: list):
     # Download in batches, the site only allows 100 at a time
-    for i in range(0, len(ids), 100):
-        batch = ids[i:i + 100]
-        tids = '&'.join([f'tids[]={id}' for id in batch])
-
-        response = session.get(
-            f"{base_url}/DownloadZips.php?type=batch&{tids}", 
-            headers={**headers, "Content-Type": "application/x-zip"},
-            timeout=30
-        )
+    batches = [ids[i:i + 100] for i in range(0, len(ids), 100)]
 
-        # Write result to zip file
-        path = os.path.join(data_dir, f"batch_{time.time()}.zip")
-        with open(path, 'wb') as f:
-            f.write(response.content) 
+    # Create the extract dir up front rather than racing on it from the workers
+    if config.AUTO_EXTRACT_DIR:
+        os.makedirs(config.AUTO_EXTRACT_DIR, exist_ok=True)
 
-        # Extract to specified dir
-        if config.AUTO_EXTRACT_DIR:
-            print(f"Extracting {path} to {config.AUTO_EXTRACT_DIR}")
-            with zipfile.ZipFile(path, 'r') as f:
-                f.extractall(config.AUTO_EXTRACT_DIR)
-            if config.AUTO_DEL_BATCH:
-                os.remove(path)
-
-        time.sleep(5)
+    try:
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+            # Consume results so errors from any batch are raised here
+            list(executor.map(_downloadOneBatch, range(len(batches)), batches))
+    finally:
+        # Earlier batches may have gone through even if a later one failed
+        _clearUserCache()
 
 def sendWebhook(content: str = None, fields: dict = None):
     """Send a Discord webhook using a plain HTTP POST (no discord.py required).
@@ -424,10 +622,10 @@ def main():
 
     # Spend free bonus points
     if config.AUTO_SPEND_POINTS:
-        r = session.get(
+        r = parseResponse(session.get(
             f"{base_url}/json/bonusBuy.php/?spendtype=upload&amount=Max Affordable ", 
             headers=headers
-        ).json()
+        ))
 
         # Extract results and send to webhook
         if r["success"]:
@@ -438,18 +636,28 @@ def main():
         print(f"You've reached your unsaturated torrent limit, not continuing.")
         return
     
-    # Create a list which we can check ids against to avoid duplicates
-    skip_ids = []
+    # Create a set which we can check ids against to avoid duplicates
+    skip_ids = set()
+
+    # Refresh lists which aren't saved or whose saved count differs from last check
+    needs_refresh = [
+        value for value in config.SKIP
+        if value not in data or user[value]['count'] != len(data[value])
+    ]
+    if needs_refresh:
+        # Each list is a separate endpoint, fetch them all at once
+        with ThreadPoolExecutor(max_workers=len(needs_refresh)) as executor:
+            futures = {}
+            for value in needs_refresh:
+                print(f"Storing {user[value]['count']} items from {value} list")
+                futures[value] = executor.submit(getSnatchListIds, user, value)
+
+            for value, future in futures.items():
+                data[value] = future.result()
+        saveDataFile()
+
     for value in config.SKIP:
-        count = user[value]['count']
-        # Do the check if not saved or saved count differs from last check
-        if value not in data or count != len(data[value]):
-            print(f"Storing {count} items from {value} list")
-            data[value] = getSnatchListIds(user, value)
-            saveDataFile()
-        skip_ids.extend(data[value])
-    
-    skip_ids = list(set(skip_ids))
+        skip_ids.update(data[value])
 
     # If user asked to search by title/author, present interactive choices
     if args.title or args.author:
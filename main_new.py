@@ -3,13 +3,17 @@ MyAnonaMouse Downloader - Main CLI interface
 Orchestrates search, torrent file download, and BitTorrent downloading.
 """
 import argparse
+import logging
 import os
 import sys
 from typing import Optional, List
 
 import config
 from mam_api import MAMClient
-from torrent_downloader import TorrentDownloader, download_torrent
+from torrent_downloader import TorrentDownloader, download_torrent, start_console_logging
+
+
+logger = logging.getLogger(__name__)
 
 
 def interactive_search(client: MAMClient, title: str = None, author: str = None, max_fetch: int = 100) -> Optional[str]:
@@ -28,12 +32,11 @@ def interactive_search(client: MAMClient, title: str = None, author: str = None,
     
     # Get user details to exclude already snatched torrents
     user = client.get_user_details()
-    snatched_ids = []
+    snatched_ids = set()
     
     if user:
         for list_type in config.SKIP:
-            if list_type in client.data:
-                snatched_ids.extend(client.data[list_type])
+            snatched_ids.update(client.get_snatch_list_ids(user, list_type))
     
     # Search for torrents
     torrents = client.search_torrents(
@@ -62,15 +65,7 @@ def interactive_search(client: MAMClient, title: str = None, author: str = None,
         title_str = torrent.get('title', '<no title>')
         
         # Parse author info
-        import json
-        author_names = ''
-        author_info_str = torrent.get('author_info', '')
-        if author_info_str:
-            try:
-                author_dict = json.loads(author_info_str)
-                author_names = ', '.join(author_dict.values())
-            except:
-                pass
+        author_names = ', '.join(client.author_names(torrent))
         
         # Format size
         size_str = ''
@@ -133,21 +128,21 @@ def download_workflow(
     """
     try:
         # Step 1: Download .torrent file from MAM
-        print(f"\n{'='*60}")
-        print(f"Step 1: Downloading .torrent file for ID {torrent_id}")
-        print(f"{'='*60}")
+        logger.info(f"\n{'='*60}")
+        logger.info(f"Step 1: Downloading .torrent file for ID {torrent_id}")
+        logger.info(f"{'='*60}")
         
         torrent_path = client.download_torrent_file(torrent_id)
         
         if not download_content:
-            print(f"\n✓ Torrent file saved to: {torrent_path}")
-            print("  (Skipping content download)")
+            logger.info(f"\n✓ Torrent file saved to: {torrent_path}")
+            logger.info("  (Skipping content download)")
             return True
         
         # Step 2: Download actual content via BitTorrent
-        print(f"\n{'='*60}")
-        print(f"Step 2: Downloading content via BitTorrent")
-        print(f"{'='*60}")
+        logger.info(f"\n{'='*60}")
+        logger.info(f"Step 2: Downloading content via BitTorrent")
+        logger.info(f"{'='*60}")
         
         if downloader:
             # Use provided downloader (allows managing multiple torrents)
@@ -155,7 +150,7 @@ def download_workflow(
             success = downloader.wait_for_completion(info_hash)
             
             if success and seed_after:
-                print(f"\nSeeding until ratio {seed_ratio} or {seed_time}s...")
+                logger.info(f"\nSeeding until ratio {seed_ratio} or {seed_time}s...")
                 import time
                 start_time = time.time()
                 
@@ -168,7 +163,7 @@ def download_workflow(
                     
                     elapsed = time.time() - start_time
                     if progress.ratio >= seed_ratio or elapsed >= seed_time:
-                        print(f"\n✓ Seeding goal reached (ratio: {progress.ratio:.2f}, time: {int(elapsed)}s)")
+                        logger.info(f"\n✓ Seeding goal reached (ratio: {progress.ratio:.2f}, time: {int(elapsed)}s)")
                         break
                     
                     time.sleep(1)
@@ -185,7 +180,7 @@ def download_workflow(
             )
     
     except Exception as e:
-        print(f"Error during download: {e}")
+        logger.error(f"Error during download: {e}")
         return False
 
 
@@ -236,6 +231,9 @@ Examples:
     
     args = parser.parse_args()
     
+    # Download progress is logged, route it to stdout through one writer thread
+    start_console_logging()
+    
     # Validate config
     if not config.MAM_ID:
         print("Error: MAM_ID not set in config.py")
@@ -243,7 +241,7 @@ Examples:
         return 1
     
     # Initialize MAM client
-    client = MAMClient(config.MAM_ID)
+    client = MAMClient(config.MAM_ID, user_cache_ttl=config.USER_CACHE_TTL)
     
     # Test connection
     user = client.get_user_details()
@@ -2,70 +2,268 @@
 MyAnonaMouse API client for searching and downloading torrent files.
 """
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+import logging
 import time
 import os
-from typing import Optional, List, Dict, Tuple
+import hashlib
+import heapq
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from rapidfuzz import fuzz, process
+from typing import Optional, List, Dict, Tuple, Iterable
+
+
+logger = logging.getLogger(__name__)
+
+# Cached user details, shared with main.py; both entry points drop it after downloading
+USER_CACHE_FILE = "user_cache.json"
+
+
+def clear_user_cache(path: str) -> None:
+    """Remove cached user details, downloads change the unsatisfied count."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Non-substring pairs whose shorter side is below this fraction of the longer can't match well
+MIN_LENGTH_RATIO = 0.4
+
+
+def _length_ok(lq: int, lt: int) -> bool:
+    """Whether lengths are close enough for a non-substring pair to be worth scoring."""
+    return min(lq, lt) >= MIN_LENGTH_RATIO * max(lq, lt)
+
+
+def _normalize(text) -> str:
+    """Normalize a query or target for matching, converting numbers to strings."""
+    return str(text).lower().strip()
+
+
+def _score_all(q: str, targets: List[str]) -> List[float]:
+    """Score a normalized query against every normalized target in one RapidFuzz call.
+    
+    Substring matches score 1, empty targets and very different lengths score 0;
+    returns 0..1 per target.
+    """
+    scores = [0.0] * len(targets)
+    lq = len(q)
+    
+    # Substring hits score 1 outright, only pass plausible lengths to the matcher
+    candidates = {}
+    for idx, t in enumerate(targets):
+        if not t:
+            continue
+        if q in t:
+            scores[idx] = 1.0
+        elif _length_ok(lq, len(t)):
+            candidates[idx] = t
+    
+    for _, score, idx in process.extract(q, candidates, scorer=fuzz.ratio, limit=None):
+        scores[idx] = score / 100.0
+    
+    return scores
+
+
+class RateLimiter:
+    """Spaces out calls so at most `rate` happen per second, across threads."""
+    
+    def __init__(self, rate: float):
+        """Initialize rate limiter.
+        
+        Args:
+            rate: Maximum number of calls per second
+        """
+        self.interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+    
+    def wait(self) -> None:
+        """Block until the caller's turn on the token clock comes up."""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        
+        if delay > 0:
+            time.sleep(delay)
 
 
 class MAMClient:
     """Client for interacting with MyAnonaMouse API."""
     
-    def __init__(self, mam_id: str, data_dir: str = "storage"):
+    # (connect, read) timeout for every request, so a stuck request can't hold a pool slot
+    TIMEOUT = (5, 30)
+    
+    def __init__(self, mam_id: str, data_dir: str = "storage", user_cache_ttl: int = 60):
         """Initialize MAM client.
         
         Args:
             mam_id: MyAnonaMouse session ID
             data_dir: Directory for storing data files
+            user_cache_ttl: Seconds to reuse fetched user details between runs (0 to disable)
         """
         self.mam_id = mam_id
         self.data_dir = data_dir
         self.base_url = "https://www.myanonamouse.net"
-        self.session = requests.Session()
         self.headers = {"cookie": f"mam_id={self.mam_id}"}
+        
+        # Reuse connections across paginated requests and retry transient server errors
+        self.session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False)
+        self.session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retries))
+        self.session.headers.update(self.headers)
         self.storage_path = os.path.join(data_dir, "data.json")
+        self.user_cache_path = os.path.join(data_dir, USER_CACHE_FILE)
+        self.user_cache_ttl = user_cache_ttl
+        self.download_limiter = RateLimiter(2)  # Be nice to the server
         self.data = {}
         
         # Create data dir if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
         
+        # Default .torrent dir, created once; other dirs are created on first use
+        self.default_torrent_dir = os.path.join(data_dir, "torrents")
+        os.makedirs(self.default_torrent_dir, exist_ok=True)
+        self._ready_dirs = {self.default_torrent_dir}
+        
+        # Nothing on disk yet means the first save has to write
+        self._dirty = True
+        # Hash of the bytes last loaded or written, to skip forced saves that change nothing
+        self._last_hash = None
+        
         # Load previously saved data
         if os.path.exists(self.storage_path):
             with open(self.storage_path, 'rb') as f:
-                self.data = json.loads(f.read())
+                content = f.read()
+            self.data = orjson.loads(content)
+            self._last_hash = hash(content)
+            self._dirty = False
     
-    def save_data(self) -> None:
-        """Save data to prevent constant unneeded requests."""
-        self.data['lastSaved'] = time.time()
-        with open(self.storage_path, 'w') as f:
-            json.dump(self.data, f, indent=2)
+    def _mark_dirty(self) -> None:
+        """Flag data as changed so the next save_data writes it."""
+        self._dirty = True
+    
+    def save_data(self, force: bool = False) -> None:
+        """Save data to prevent constant unneeded requests.
+        
+        Only writes when data was changed through the client. Callers that
+        edit `data` directly should pass force=True; the write is then
+        skipped if the content turns out to be unchanged. The file is
+        replaced atomically.
+        
+        Args:
+            force: Check for direct edits to `data` even if not flagged dirty
+        """
+        if not (self._dirty or force):
+            return
+        
+        if self._dirty:
+            self.data['lastSaved'] = time.time()
+        content = orjson.dumps(self.data, option=orjson.OPT_INDENT_2)
+        
+        if not self._dirty:
+            if hash(content) == self._last_hash:
+                return
+            # Direct edits changed something, stamp the save time as well
+            self.data['lastSaved'] = time.time()
+            content = orjson.dumps(self.data, option=orjson.OPT_INDENT_2)
+        
+        tmp_path = self.storage_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, self.storage_path)
+        self._last_hash = hash(content)
+        self._dirty = False
+    
+    def _user_cache_key(self) -> str:
+        """Key cached user details on the session ID so accounts don't share them."""
+        return hashlib.sha256(self.mam_id.encode()).hexdigest()
+    
+    def _load_user_cache(self) -> Optional[dict]:
+        """Load user details saved less than user_cache_ttl seconds ago."""
+        if not self.user_cache_ttl or not os.path.exists(self.user_cache_path):
+            return None
+        if time.time() - os.path.getmtime(self.user_cache_path) >= self.user_cache_ttl:
+            return None
+        
+        with open(self.user_cache_path, 'rb') as f:
+            try:
+                cached = orjson.loads(f.read())
+            except orjson.JSONDecodeError:
+                return None
+        
+        if cached.get('key') != self._user_cache_key():
+            return None
+        return cached.get('user')
+    
+    def _save_user_cache(self, user: dict) -> None:
+        """Save user details for reuse by runs within user_cache_ttl."""
+        if not self.user_cache_ttl:
+            return
+        with open(self.user_cache_path, 'wb') as f:
+            f.write(orjson.dumps({"key": self._user_cache_key(), "user": user}))
+    
+    def _clear_user_cache(self) -> None:
+        """Drop cached user details so the next lookup refetches them."""
+        clear_user_cache(self.user_cache_path)
     
     def get_user_details(self) -> Optional[dict]:
         """Get user details from MAM.
         
+        Details fetched within the last user_cache_ttl seconds are reused
+        instead of requesting them again.
+        
         Returns:
             User details dict or None if request fails
         """
+        user = self._load_user_cache()
+        if user:
+            return user
+        
         response = self.session.get(
             f"{self.base_url}/jsonLoad.php?snatch_summary",
-            headers=self.headers
+            timeout=self.TIMEOUT
         )
         
         if response.status_code != 200:
             return None
         
-        return response.json()
+        user = orjson.loads(response.content)
+        self._save_user_cache(user)
+        return user
     
-    def get_snatch_list_ids(self, user: dict, list_type: str = 'sSat') -> List[str]:
+    def get_snatch_list_ids(self, user: dict, list_type: str = 'sSat', max_age: int = 3600) -> List[str]:
         """Get list of torrent IDs from a user's snatch list.
         
+        A saved list is served without paging the API when its length
+        matches the count in user details, or when it was fetched within
+        max_age seconds.
+        
         Args:
             user: User details dict
             list_type: Type of list (sSat, unsat, etc.)
+            max_age: Seconds a fetched list stays fresh (0 to always fetch)
         
         Returns:
             List of torrent IDs
         """
+        fetched_key = f"{list_type}LastFetch"
+        stored = self.data.get(list_type)
+        if stored is not None:
+            # Same check main.py uses, so lists it keeps current are reused
+            if len(stored) == user[list_type]['count']:
+                return stored
+            fetched_at = self.data.get(fetched_key)
+            if fetched_at and time.time() - fetched_at < max_age:
+                return stored
+        
         results = []
         iteration = 0
         keep_going = True
@@ -74,10 +272,13 @@ class MAMClient:
         while keep_going:
             response = self.session.get(
                 f"{self.base_url}/json/loadUserDetailsTorrents.php?uid={user['uid']}&type={list_type}&iteration={iteration}",
-                headers=self.headers
+                timeout=self.TIMEOUT
             )
             
-            cur = response.json()
+            cur = orjson.loads(response.content)
+            # Keep whatever was saved rather than storing a failed fetch
+            if 'error' in cur:
+                return stored if stored is not None else results
             if not cur.get('rows'):
                 break
             
@@ -90,6 +291,11 @@ class MAMClient:
             results.extend(ids)
             iteration += 1
         
+        self.data[list_type] = results
+        self.data[fetched_key] = time.time()
+        self._mark_dirty()
+        self.save_data()
+        
         return results
     
     def search_torrents(
@@ -98,7 +304,7 @@ class MAMClient:
         author: Optional[str] = None,
         search_config: Optional[dict] = None,
         max_results: int = 100,
-        snatched_ids: Optional[List[str]] = None
+        snatched_ids: Optional[Iterable[str]] = None
     ) -> List[dict]:
         """Search for torrents on MAM.
         
@@ -107,14 +313,19 @@ class MAMClient:
             author: Author to search for
             search_config: Custom search configuration
             max_results: Maximum number of results to return
-            snatched_ids: List of already snatched torrent IDs to exclude
+            snatched_ids: Already snatched torrent IDs to exclude
         
         Returns:
             List of torrent dicts
         """
-        snatched_ids = snatched_ids or []
+        # Hash lookups for the per-torrent check, snatch lists can be very large
+        snatched_set = frozenset(snatched_ids or ())
         results = []
-        iteration = 0
+        results_append = results.append
+        count = 0
+        start_number = 0
+        seen_ids = set()
+        last_batch_ids = None
         
         # Build search payload
         if title or author:
@@ -149,32 +360,50 @@ class MAMClient:
                 }
             }
         
-        while len(results) < max_results:
+        # Give up after this many pages that bring no ids we haven't seen
+        max_stale_pages = 2
+        stale_pages = 0
+        
+        while count < max_results:
             payload['perpage'] = 100
-            payload['tor']['startNumber'] = iteration
+            payload['tor']['startNumber'] = start_number
             
             response = self.session.post(
                 f"{self.base_url}/tor/js/loadSearchJSONbasic.php",
-                headers=self.headers,
-                json=payload
+                json=payload,
+                timeout=self.TIMEOUT
             )
             
-            cur = response.json()
+            cur = orjson.loads(response.content)
             
             if 'error' in cur or not cur.get('data'):
                 break
             
-            for torrent in cur['data']:
-                tid = str(torrent.get('id'))
-                if tid not in snatched_ids:
-                    results.append(torrent)
-                    if len(results) >= max_results:
+            # Server returned the same page again, paging has stalled
+            batch_ids = [str(torrent.get('id')) for torrent in cur['data']]
+            if batch_ids == last_batch_ids:
+                break
+            last_batch_ids = batch_ids
+            
+            new_ids = 0
+            for tid, torrent in zip(batch_ids, cur['data']):
+                if tid in seen_ids:
+                    continue
+                seen_ids.add(tid)
+                new_ids += 1
+                if tid not in snatched_set:
+                    results_append(torrent)
+                    count += 1
+                    if count >= max_results:
                         break
             
-            iteration += len(cur['data'])
+            start_number += len(cur['data'])
             
-            if len(cur['data']) == 0:
-                break
+            # Offset isn't moving through new rows, stop rather than re-fetch
+            if not new_ids:
+                stale_pages += 1
+                if stale_pages >= max_stale_pages:
+                    break
         
         return results
     
@@ -188,18 +417,36 @@ class MAMClient:
         Returns:
             Score between 0 and 1
         """
-        from difflib import SequenceMatcher
-        
         if not query or not target:
             return 0.0
         
-        q = str(query).lower().strip()
-        t = str(target).lower().strip()
+        return _score_all(_normalize(query), [_normalize(target)])[0]
+    
+    @staticmethod
+    def author_names(torrent: dict) -> List[str]:
+        """Get author names from a torrent's author_info.
         
-        if q in t:
-            return 1.0
+        The JSON is parsed on first access and cached on the torrent dict,
+        so re-ranking or displaying the same results doesn't parse it again.
+        
+        Args:
+            torrent: Torrent dict from search results
         
-        return SequenceMatcher(None, q, t).ratio()
+        Returns:
+            List of author names (empty if missing or invalid)
+        """
+        names = torrent.get('_author_cached')
+        if names is None:
+            # author_info is a JSON string like {"8234": "Kerrelyn Sparks"}
+            names = []
+            author_info_str = torrent.get('author_info', '')
+            if author_info_str:
+                try:
+                    names = [str(v) for v in orjson.loads(author_info_str).values()]
+                except:
+                    pass
+            torrent['_author_cached'] = names
+        return names
     
     def rank_search_results(
         self,
@@ -219,36 +466,40 @@ class MAMClient:
         Returns:
             List of (score, torrent) tuples, sorted by score
         """
-        scored = []
+        t_titles = []
+        t_authors = []
         
         for t in torrents:
             t_title = t.get('title', '')
+            t_author = ' '.join(self.author_names(t)) or t.get('owner_name', '')
             
-            # Parse author info
-            t_author = ''
-            author_info_str = t.get('author_info', '')
-            if author_info_str:
-                try:
-                    author_dict = json.loads(author_info_str)
-                    t_author = ' '.join(author_dict.values())
-                except:
-                    pass
-            
-            if not t_author:
-                t_author = t.get('owner_name', '')
-            
-            title_score = self.fuzzy_score(title, t_title) if title else 0
-            author_score = self.fuzzy_score(author, t_author) if author else 0
-            
-            if title and author:
-                score = title_score * 0.7 + author_score * 0.3
-            else:
-                score = max(title_score, author_score)
-            
-            scored.append((score, t))
+            t_titles.append(_normalize(t_title) if t_title else '')
+            t_authors.append(_normalize(t_author) if t_author else '')
         
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [item for item in scored if item[0] > 0][:top_n]
+        # Score each field against all rows at once
+        no_scores = [0.0] * len(torrents)
+        title_scores = _score_all(_normalize(title), t_titles) if title else no_scores
+        author_scores = _score_all(_normalize(author), t_authors) if author else no_scores
+        
+        if title and author:
+            combined = [ts * 0.7 + au * 0.3 for ts, au in zip(title_scores, author_scores)]
+        else:
+            combined = title_scores if title else author_scores
+        
+        # Partial top-k selection instead of sorting every row
+        return heapq.nlargest(
+            top_n,
+            ((score, t) for score, t in zip(combined, torrents) if score > 0),
+            key=lambda x: x[0]
+        )
+    
+    def _resolve_output_dir(self, output_dir: Optional[str]) -> str:
+        """Get the directory to save .torrent files in, creating it on first use."""
+        output_dir = output_dir or self.default_torrent_dir
+        if output_dir not in self._ready_dirs:
+            os.makedirs(output_dir, exist_ok=True)
+            self._ready_dirs.add(output_dir)
+        return output_dir
     
     def download_torrent_file(self, torrent_id: str, output_dir: str = None) -> str:
         """Download a .torrent file from MAM.
@@ -260,54 +511,72 @@ class MAMClient:
         Returns:
             Path to the downloaded torrent file
         """
-        if output_dir is None:
-            output_dir = os.path.join(self.data_dir, "torrents")
-        
-        os.makedirs(output_dir, exist_ok=True)
+        output_dir = self._resolve_output_dir(output_dir)
         
-        response = self.session.get(
+        with self.session.get(
             f"{self.base_url}/tor/download.php?tid={torrent_id}",
-            headers=self.headers
-        )
-        
-        if response.status_code != 200:
-            raise Exception(f"Failed to download torrent {torrent_id}: {response.status_code}")
-        
-        # Try to get filename from Content-Disposition header
-        filename = None
-        if 'Content-Disposition' in response.headers:
-            content_disp = response.headers['Content-Disposition']
-            if 'filename=' in content_disp:
-                filename = content_disp.split('filename=')[1].strip('"')
-        
-        if not filename:
-            filename = f"{torrent_id}.torrent"
-        
-        filepath = os.path.join(output_dir, filename)
-        
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
+            stream=True,
+            timeout=self.TIMEOUT
+        ) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to download torrent {torrent_id}: {response.status_code}")
+            
+            # Try to get filename from Content-Disposition header (plain or RFC 5987 filename*)
+            filename = None
+            if 'Content-Disposition' in response.headers:
+                msg = Message()
+                msg['Content-Disposition'] = response.headers['Content-Disposition']
+                filename = msg.get_filename()
+                if filename:
+                    filename = os.path.basename(filename)
+            
+            if not filename:
+                filename = f"{torrent_id}.torrent"
+            
+            filepath = os.path.join(output_dir, filename)
+            
+            # Copy straight from the socket rather than buffering the whole body
+            response.raw.decode_content = True
+            with open(filepath, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=1 << 16)
         
-        print(f"Downloaded torrent file: {filepath}")
+        self._clear_user_cache()
+        logger.info(f"Downloaded torrent file: {filepath}")
         return filepath
     
-    def download_batch_torrents(self, torrent_ids: List[str], output_dir: str = None) -> List[str]:
-        """Download multiple torrent files.
+    def download_batch_torrents(
+        self,
+        torrent_ids: List[str],
+        output_dir: str = None,
+        max_workers: int = 4
+    ) -> List[str]:
+        """Download multiple torrent files concurrently.
+        
+        Requests share the client's rate limiter, so concurrency overlaps
+        round-trips without raising the request rate.
         
         Args:
             torrent_ids: List of torrent IDs to download
             output_dir: Directory to save torrent files
+            max_workers: Maximum number of downloads in flight
         
         Returns:
-            List of paths to downloaded torrent files
+            List of paths to downloaded torrent files, in input order
         """
+        # Create the directory before the workers start
+        output_dir = self._resolve_output_dir(output_dir)
+        
+        def download(tid: str) -> str:
+            self.download_limiter.wait()
+            return self.download_torrent_file(tid, output_dir)
+        
         paths = []
-        for tid in torrent_ids:
-            try:
-                path = self.download_torrent_file(tid, output_dir)
-                paths.append(path)
-                time.sleep(1)  # Be nice to the server
-            except Exception as e:
-                print(f"Error downloading torrent {tid}: {e}")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(tid, executor.submit(download, tid)) for tid in torrent_ids]
+            for tid, future in futures:
+                try:
+                    paths.append(future.result())
+                except Exception as e:
+                    logger.error(f"Error downloading torrent {tid}: {e}")
         
         return paths
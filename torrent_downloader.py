@@ -2,13 +2,72 @@
 BitTorrent downloader using libtorrent.
 """
 import libtorrent as lt
+import atexit
+import logging
+import logging.handlers
+import queue
 import time
 import os
+import sys
+import threading
 from typing import Optional, Callable, Dict, List
 from dataclasses import dataclass
 from enum import Enum
 
 
+logger = logging.getLogger(__name__)
+
+# Queue and listener behind start_console_logging, set up at most once per process
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_log_listener: Optional[logging.handlers.QueueListener] = None
+_log_lock = threading.Lock()
+
+
+class _RedrawHandler(logging.StreamHandler):
+    """Stream handler that redraws the current line for records logged with redraw=True."""
+    
+    def emit(self, record: logging.LogRecord):
+        if not getattr(record, "redraw", False):
+            super().emit(record)
+            return
+        try:
+            self.stream.write("\r" + self.format(record))
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+def start_console_logging(level: int = logging.INFO):
+    """Write log records to stdout from a background thread.
+    
+    Meant for CLI entry points: attaches a queue handler to the root logger,
+    once per process, so logging calls never wait on the terminal.
+    
+    Args:
+        level: Level to set on the root logger
+    """
+    global _log_listener
+    with _log_lock:
+        if _log_listener:
+            return
+        
+        stream_handler = _RedrawHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter("%(message)s"))
+        _log_listener = logging.handlers.QueueListener(_log_queue, stream_handler)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+        
+        root = logging.getLogger()
+        root.addHandler(logging.handlers.QueueHandler(_log_queue))
+        root.setLevel(level)
+
+
+def _flush_logging():
+    """Block until queued records are written."""
+    if _log_listener:
+        _log_queue.join()
+
+
 class TorrentState(Enum):
     """Torrent download states."""
     QUEUED = "queued"
@@ -20,9 +79,9 @@ class TorrentState(Enum):
     ERROR = "error"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TorrentProgress:
-    """Progress information for a torrent download."""
+    """Progress information for a torrent download (immutable snapshot)."""
     name: str
     state: TorrentState
     progress: float  # 0.0 to 1.0
@@ -40,6 +99,11 @@ class TorrentProgress:
 class TorrentDownloader:
     """Manages torrent downloads using libtorrent."""
     
+    # Progress bar glyphs, sliced per redraw instead of rebuilt
+    _BAR_WIDTH = 30
+    _BAR_FULL = "█" * _BAR_WIDTH
+    _BAR_EMPTY = "░" * _BAR_WIDTH
+    
     def __init__(
         self,
         download_dir: str = "storage/downloads",
@@ -68,6 +132,8 @@ class TorrentDownloader:
             'enable_lsd': True,
             'enable_upnp': True,
             'enable_natpmp': True,
+            # Completion and errors are pushed as alerts rather than polled for
+            'alert_mask': lt.alert.category_t.status_notification | lt.alert.category_t.error_notification,
         }
         
         self.session.apply_settings(settings)
@@ -85,6 +151,11 @@ class TorrentDownloader:
         
         # Track active torrents
         self.handles: Dict[str, lt.torrent_handle] = {}
+        
+        # Values shown by the last progress line, to skip redrawing an unchanged one
+        self._last_progress_key = None
+        self._last_bar_filled = None
+        self._last_bar = ""
     
     def add_torrent(
         self,
@@ -121,8 +192,8 @@ class TorrentDownloader:
         info_hash = str(info.info_hash())
         self.handles[info_hash] = handle
         
-        print(f"Added torrent: {info.name()}")
-        print(f"Info hash: {info_hash}")
+        logger.info(f"Added torrent: {info.name()}")
+        logger.info(f"Info hash: {info_hash}")
         
         return info_hash
     
@@ -138,9 +209,17 @@ class TorrentDownloader:
         if info_hash not in self.handles:
             return None
         
-        handle = self.handles[info_hash]
-        status = handle.status()
+        return self._progress_from_status(self.handles[info_hash].status())
+    
+    def _progress_from_status(self, status: lt.torrent_status) -> TorrentProgress:
+        """Build progress information from an already fetched torrent status.
+        
+        Args:
+            status: Status snapshot from handle.status()
         
+        Returns:
+            TorrentProgress object
+        """
         # Map libtorrent state to our TorrentState
         state_map = {
             lt.torrent_status.checking_files: TorrentState.CHECKING,
@@ -187,10 +266,13 @@ class TorrentDownloader:
     ) -> bool:
         """Wait for a torrent to complete downloading.
         
+        Completion and errors are picked up from libtorrent alerts as soon
+        as they are posted; status is only fetched to render progress.
+        
         Args:
             info_hash: Info hash of the torrent
             callback: Optional callback function called with progress updates
-            update_interval: How often to check progress (seconds)
+            update_interval: How often to report progress (seconds)
         
         Returns:
             True if completed successfully, False if error
@@ -200,37 +282,69 @@ class TorrentDownloader:
         
         handle = self.handles[info_hash]
         
-        print(f"\nDownloading: {handle.status().name}")
-        
-        while not handle.status().is_seeding:
-            status = handle.status()
-            
-            progress = self.get_progress(info_hash)
-            if progress and callback:
-                callback(progress)
-            
-            # Print progress
-            self._print_progress(progress)
-            
-            # Check for errors
-            if status.error:
-                print(f"\nError: {status.error}")
-                return False
+        status = handle.status()
+        logger.info(f"\nDownloading: {status.name}")
+        
+        finished = False
+        next_update = time.monotonic()
+        
+        while True:
+            now = time.monotonic()
+            if finished or now >= next_update:
+                status = handle.status()
+                progress = self._progress_from_status(status)
+                if callback:
+                    callback(progress)
+                
+                # Print progress
+                self._print_progress(progress)
+                
+                # Check for errors
+                if status.error:
+                    logger.error(f"\nError: {status.error}")
+                    return False
+                
+                # Check if finished
+                if finished or status.is_seeding or status.is_finished:
+                    break
+                
+                next_update = now + update_interval
             
-            # Check if finished
-            if status.is_finished:
-                break
+            # Block until libtorrent posts an alert or the next progress update is due
+            timeout_ms = max(int((next_update - time.monotonic()) * 1000), 0)
+            self.session.wait_for_alert(timeout_ms)
             
-            time.sleep(update_interval)
-        
-        print(f"\n✓ Download complete: {handle.status().name}")
+            for alert in self.session.pop_alerts():
+                if isinstance(alert, lt.torrent_finished_alert) and alert.handle == handle:
+                    finished = True
+                elif isinstance(alert, lt.torrent_error_alert) and alert.handle == handle:
+                    logger.error(f"\nError: {alert.message()}")
+                    return False
+        
+        logger.info(f"\n✓ Download complete: {status.name}")
         return True
     
     def _print_progress(self, progress: TorrentProgress):
-        """Print progress information to console."""
+        """Print progress information to console.
+        
+        Skips the redraw when progress moved less than 0.1% and rates
+        changed by less than 1 KB/s since the last line.
+        """
         if not progress:
             return
         
+        key = (
+            progress.state,
+            int(progress.progress * 1000),
+            int(progress.download_rate) >> 10,
+            int(progress.upload_rate) >> 10,
+            progress.num_peers,
+            progress.num_seeds,
+        )
+        if key == self._last_progress_key:
+            return
+        self._last_progress_key = key
+        
         # Format rates
         dl_rate = self._format_bytes(progress.download_rate) + "/s"
         ul_rate = self._format_bytes(progress.upload_rate) + "/s"
@@ -241,27 +355,31 @@ class TorrentDownloader:
         eta_str = self._format_time(progress.eta) if progress.eta >= 0 else "∞"
         
         # Progress bar
-        bar_width = 30
-        filled = int(bar_width * progress.progress)
-        bar = "█" * filled + "░" * (bar_width - filled)
-        
-        print(
-            f"\r{progress.state.value.upper()} [{bar}] "
+        filled = int(self._BAR_WIDTH * progress.progress)
+        if filled != self._last_bar_filled:
+            self._last_bar = self._BAR_FULL[:filled] + self._BAR_EMPTY[filled:]
+            self._last_bar_filled = filled
+        bar = self._last_bar
+        
+        line = (
+            f"{progress.state.value.upper()} [{bar}] "
             f"{progress.progress*100:.1f}% "
             f"({downloaded}/{total}) "
             f"↓ {dl_rate} ↑ {ul_rate} "
             f"Peers: {progress.num_peers} Seeds: {progress.num_seeds} "
-            f"ETA: {eta_str}",
-            end="", flush=True
+            f"ETA: {eta_str}"
         )
+        
+        # Redraw in place on a terminal, otherwise log one line per update
+        logger.info(line, extra={"redraw": sys.stdout.isatty()})
+    
+    _BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
     
     def _format_bytes(self, bytes: float) -> str:
         """Format bytes to human readable string."""
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if bytes < 1024.0:
-                return f"{bytes:.1f} {unit}"
-            bytes /= 1024.0
-        return f"{bytes:.1f} PB"
+        # Each unit is 2**10 of the previous, so the bit length picks it directly
+        exp = min(max(int(bytes).bit_length() - 1, 0) // 10, len(self._BYTE_UNITS) - 1)
+        return f"{bytes / (1 << (10 * exp)):.1f} {self._BYTE_UNITS[exp]}"
     
     def _format_time(self, seconds: int) -> str:
         """Format seconds to human readable time string."""
@@ -307,7 +425,7 @@ class TorrentDownloader:
     
     def shutdown(self):
         """Shutdown the torrent session gracefully."""
-        print("\nShutting down torrent session...")
+        logger.info("\nShutting down torrent session...")
         
         # Save resume data for all torrents
         for handle in self.handles.values():
@@ -319,7 +437,10 @@ class TorrentDownloader:
         
         self.session = None
         self.handles.clear()
-        print("Torrent session closed.")
+        logger.info("Torrent session closed.")
+        
+        # Let queued records reach stdout before the caller carries on
+        _flush_logging()
 
 
 def download_torrent(
@@ -348,7 +469,7 @@ def download_torrent(
         success = downloader.wait_for_completion(info_hash)
         
         if success and seed_after:
-            print(f"\nSeeding until ratio {seed_ratio} or {seed_time}s...")
+            logger.info(f"\nSeeding until ratio {seed_ratio} or {seed_time}s...")
             start_time = time.time()
             
             while True:
@@ -361,7 +482,7 @@ def download_torrent(
                 # Check if seeding goals met
                 elapsed = time.time() - start_time
                 if progress.ratio >= seed_ratio or elapsed >= seed_time:
-                    print(f"\n✓ Seeding goal reached (ratio: {progress.ratio:.2f}, time: {int(elapsed)}s)")
+                    logger.info(f"\n✓ Seeding goal reached (ratio: {progress.ratio:.2f}, time: {int(elapsed)}s)")
                     break
                 
                 time.sleep(1)